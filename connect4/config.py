@@ -1,15 +1,16 @@
 import os
-import logging
 from dotenv import load_dotenv
 
+from connect4.logging_pipeline import parse_sample_rates, setup_logging
+
 load_dotenv('.env')
 
 LOG_LEVEL = os.getenv("LOG_LEVEL")
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))
 API_PREFIX = os.getenv('API_PREFIX')
 SLACK_WEB_CLIENT_TOKEN = os.getenv("SLACK_WEB_CLIENT_TOKEN")
 SLACK_APP_TOKEN = os.getenv('SLACK_APP_TOKEN')
+PROFILER_ADMIN_TOKEN = os.getenv('PROFILER_ADMIN_TOKEN')
+IDLE_GAME_TIMEOUT = int(os.getenv('IDLE_GAME_TIMEOUT', 7 * 24 * 60 * 60))
 
-logger = logging
-
-logger.basicConfig(level=LOG_LEVEL, format='%(asctime)s -%(levelname)s - %(message)s',
-                   datefmt='%d-%b-%y %H:%M:%S')
+logger = setup_logging(LOG_LEVEL, LOG_SAMPLE_RATES)
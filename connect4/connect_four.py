@@ -1,5 +1,7 @@
 from typing import Union
 
+from connect4.profiler import timed
+
 
 # ConnectFour is a class that represents a game of Connect Four.
 class ConnectFour:
@@ -38,6 +40,7 @@ class ConnectFour:
         """
         return not bool(self._board[self._game_column][-1])
 
+    @timed
     def make_move(self) -> (list[list[int]], int):
         """
         The function takes in a board and a player, and returns a new board with the player's move added
@@ -60,6 +63,7 @@ class ConnectFour:
         """
         return all([bool(col[-1]) for col in self._board])
 
+    @timed
     def check_win(self) -> list[tuple]:
         """
         We check for a win in the row, column, and both diagonals of the last move
@@ -1,9 +1,12 @@
 import json
+import time
 
 from fastapi import Response
 from slack_sdk.errors import SlackApiError
 
-from connect4.config import logger
+from connect4.config import IDLE_GAME_TIMEOUT, logger
+from connect4.profiler import timed
+from connect4.tournament import ROUND_ROBIN, Tournament
 
 
 def build_response(msg, code, headers=None):
@@ -46,9 +49,12 @@ def build_board_matrix(board_dimensions: tuple[int, int] = None):
     return [[0] * board_dimensions[0]] * board_dimensions[1]
 
 
-def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: tuple[int, int]):
+@timed
+def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: tuple[int, int],
+                           turn_timeout: int = 0):
     """
-    It takes in the player IDs and the board dimensions, and returns a tuple of metadata and blocks
+    It takes in the player IDs, the board dimensions and the time allowed per move, and returns a tuple of
+    metadata and blocks
     
     :param player1_id: str, player2_id: str, board_dimensions: tuple[int, int]
     :type player1_id: str
@@ -56,6 +62,8 @@ def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: t
     :type player2_id: str
     :param board_dimensions: tuple[int, int]
     :type board_dimensions: tuple[int, int]
+    :param turn_timeout: the number of seconds a player has to make a move, 0 for no limit
+    :type turn_timeout: int
     :return: A tuple of two objects. The first object is a dictionary and the second object is a list of
     dictionaries.
     """
@@ -70,6 +78,9 @@ def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: t
             "board_dimensions": board_dimensions,
             "game_board": build_board_matrix(board_dimensions),
             "game_status": "ongoing",
+            "turn_timeout": turn_timeout,
+            "turn_deadline": int(time.time()) + turn_timeout if turn_timeout else 0,
+            "idle_deadline": int(time.time()) + IDLE_GAME_TIMEOUT,
         }
     }
 
@@ -97,6 +108,7 @@ def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: t
             "text": {
                 "type": "mrkdwn",
                 "text": f"*<@{player1_id}> --> {player_emoji.get(1)} vs <@{player2_id}> --> {player_emoji.get(-1)}*"
+                        + (f"\t:stopwatch: _{format_duration(turn_timeout)} per move_" if turn_timeout else "")
             },
         },
         {
@@ -135,6 +147,22 @@ def build_new_game_message(player1_id: str, player2_id: str, board_dimensions: t
     return metadata, blocks
 
 
+def format_duration(seconds: int) -> str:
+    """
+    It turns a number of seconds into a short human readable duration, e.g. `5 min` or `1 day`
+    
+    :param seconds: The duration in seconds
+    :type seconds: int
+    :return: A string.
+    """
+    for unit, unit_seconds in (("day", 86400), ("hour", 3600), ("min", 60)):
+        if seconds >= unit_seconds and seconds % unit_seconds == 0:
+            count = seconds // unit_seconds
+            return f"{count} {unit}" + ("s" if count > 1 and unit != "min" else "")
+    return f"{seconds} sec"
+
+
+@timed
 def modify_game_board_message(blocks, block_indexer, row, col, player, board_dimensions):
     """
     It takes in the blocks of the message, the block indexer, the row and column of the move, the
@@ -156,6 +184,7 @@ def modify_game_board_message(blocks, block_indexer, row, col, player, board_dim
     return blocks
 
 
+@timed
 def modify_game_board_win_positions(blocks, block_indexer, win_positions, player, board_dimensions):
     """
     It takes in the blocks, block_indexer, win_positions, player, and board_dimensions, and returns the
@@ -172,12 +201,91 @@ def modify_game_board_win_positions(blocks, block_indexer, win_positions, player
     player_win_emoji = {1: ":blue_heart:", -1: ":yellow_heart:"}
     for col, row in win_positions:
         new_text: str = blocks[block_indexer.get(str(board_dimensions[0] - 1 - row))].get('elements')[col].get('text')
-        print(new_text)
         new_text = new_text.replace(player_emoji.get(player), player_win_emoji.get(player))
         blocks[block_indexer.get(str(board_dimensions[0] - 1 - row))].get('elements')[col].update({'text': new_text})
     return blocks
 
 
+def refresh_game_deadlines(metadata_payload: dict):
+    """
+    It restarts the idle clock of a game that is still ongoing, and the clock for the next player if the game
+    has a time limit per move
+    
+    :param metadata_payload: the event payload of the game message metadata
+    :type metadata_payload: dict
+    """
+    if metadata_payload.get('game_status') != 'ongoing':
+        return
+    metadata_payload.update({'idle_deadline': int(time.time()) + IDLE_GAME_TIMEOUT})
+    if metadata_payload.get('turn_timeout'):
+        metadata_payload.update({'turn_deadline': int(time.time()) + metadata_payload.get('turn_timeout')})
+
+
+def get_game_deadline(metadata_payload: dict) -> int:
+    """
+    It returns the next deadline of an ongoing game: the end of the current turn if moves are timed, otherwise
+    the moment the game counts as abandoned
+    
+    :param metadata_payload: the event payload of the game message metadata
+    :type metadata_payload: dict
+    :return: A unix timestamp, 0 if the game has no deadline.
+    """
+    if metadata_payload.get('game_status') != 'ongoing':
+        return 0
+    return metadata_payload.get('turn_deadline') or metadata_payload.get('idle_deadline') or 0
+
+
+def build_tournament_standings_message(tournament: Tournament):
+    """
+    It takes in a tournament and returns the text and blocks of its live standings message
+    
+    :param tournament: The tournament to render
+    :type tournament: Tournament
+    :return: A tuple of the fallback text and a list of blocks.
+    """
+    bracket_name = "Round Robin" if tournament.bracket_format == ROUND_ROBIN else "Knockout"
+    if tournament.finished and tournament.champion:
+        status = f":trophy: *<@{tournament.champion}>* won the tournament :confetti_ball:"
+    elif tournament.finished:
+        status = ":warning: The tournament ended without a champion"
+    else:
+        status = f"Round *{tournament.round}* of {tournament.total_rounds} in progress"
+    rows = [f"{position}. <@{player}> - *{tournament.points(player)} pts* "
+            f"({tournament.stats[player]['won']}W {tournament.stats[player]['drawn']}D {tournament.stats[player]['lost']}L)"
+            + (f" - {tournament.stats[player]['unplayed']} not played" if tournament.stats[player]['unplayed'] else "")
+            for position, player in enumerate(tournament.standings(), start=1)]
+    blocks: list[dict] = [
+        {
+            "block_id": "header",
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": f"*CONNECT 4 TOURNAMENT* - {bracket_name}"}
+        },
+        {
+            "block_id": "tournament_status",
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": status}
+        },
+        {
+            "block_id": "divider1",
+            "type": "divider"
+        },
+        {
+            "block_id": "standings",
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "\n".join(rows)}
+        }
+    ]
+    if tournament.unplayed_matches:
+        blocks.append({
+            "block_id": "unplayed",
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": ":warning: These games could not be started and count as not played: "
+                                                    + ", ".join(f"<@{player1}> vs <@{player2}>"
+                                                                for player1, player2 in tournament.unplayed_matches)}]
+        })
+    return f"Connect4 tournament - {bracket_name}", blocks
+
+
 def get_play_again_button_block() -> dict:
     return {
         "type": "actions",
@@ -212,5 +320,5 @@ def open_modal(path, trigger_id, slack_client):
         try:
             slack_client.views_open(trigger_id=trigger_id, view=view)
         except SlackApiError as e:
-            logger.error(f"An error occurred while opening slack modal: {e}")
+            logger.error("An error occurred while opening slack modal: %s", e)
     # return empty_response(200)
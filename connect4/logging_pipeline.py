@@ -0,0 +1,138 @@
+import atexit
+import copy
+import json
+import logging
+import math
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Attributes that may be attached to a record through `extra=` and are copied into the JSON output
+STRUCTURED_FIELDS = ('event', 'game_id', 'strategy', 'duration_ms')
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        It renders a record as a single compact JSON line, carrying the structured fields when present
+
+        :param record: The log record to be rendered
+        :type record: logging.LogRecord
+        :return: A JSON string.
+        """
+        entry: dict = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        exc_text = getattr(record, 'exc', None) or (self.formatException(record.exc_info) if record.exc_info else None)
+        if exc_text:
+            entry["exc"] = exc_text
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        It merges the message with its args and renders any traceback into the `exc` attribute, so the record
+        can be pickled or handed to another thread without the args or the live exception
+
+        :param record: The log record to be queued
+        :type record: logging.LogRecord
+        :return: A copy of the record, safe to be formatted later.
+        """
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = record.exc_text = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rates: dict[str, float]):
+        """
+        It takes a mapping of event names to the fraction of those events that should be kept
+
+        :param sample_rates: A dictionary of event name to a rate between 0 and 1
+        :type sample_rates: dict[str, float]
+        """
+        super().__init__()
+        self._sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Records without an event, or with an event that has no rate, are always kept. Warnings and
+        errors are never sampled out.
+        :return: a boolean value.
+        """
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._sample_rates.get(getattr(record, 'event', None))
+        return rate is None or random.random() < rate
+
+
+def parse_sample_rates(raw: Optional[str]) -> dict[str, float]:
+    """
+    It parses a comma separated list of `event=rate` pairs, e.g. `interaction_payload=0.01,slack_response=0.1`.
+    Pairs whose rate is not a finite number are skipped with a warning, so a bad value never stops the app.
+
+    :param raw: The raw string, usually read from the environment
+    :type raw: Optional[str]
+    :return: A dictionary of event name to sampling rate.
+    """
+    sample_rates: dict[str, float] = {}
+    for pair in (raw or '').split(','):
+        event, _, rate = pair.partition('=')
+        if not event.strip() or not rate.strip():
+            continue
+        try:
+            value = float(rate)
+        except ValueError:
+            value = math.nan
+        if not math.isfinite(value):
+            logging.getLogger('connect4').warning("Ignoring invalid log sample rate %r for event %r", rate, event.strip())
+            continue
+        sample_rates[event.strip()] = min(max(value, 0.0), 1.0)
+    return sample_rates
+
+
+def setup_logging(level: Optional[str], sample_rates: dict[str, float]) -> logging.Logger:
+    """
+    It configures the `connect4` logger once. Records are level-checked and sampled on the calling
+    thread, and only the records that pass have their message merged with its args there, before the
+    args can be mutated. Rendering to JSON and writing to stderr happen on a background writer thread,
+    so request handlers never block on I/O.
+
+    :param level: The log level name, defaults to INFO
+    :type level: Optional[str]
+    :param sample_rates: A dictionary of event name to sampling rate
+    :type sample_rates: dict[str, float]
+    :return: The configured logger.
+    """
+    global _listener
+    logger = logging.getLogger('connect4')
+    if _listener:
+        return logger
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+    logger.setLevel(level or logging.INFO)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return logger
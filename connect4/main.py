@@ -1,23 +1,24 @@
 import asyncio
+import hmac
 import json
-import logging
+import math
+from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, Request, Response
 from slack_sdk import WebClient
 
 from connect4.slack_events.commands import CommandContext, HelpCommandStrategy, FeedbackModalCommandStrategy, \
     GameStartModalCommandStrategy
-from connect4.config import API_PREFIX, LOG_LEVEL, SLACK_WEB_CLIENT_TOKEN
+from connect4.config import API_PREFIX, PROFILER_ADMIN_TOKEN, SLACK_WEB_CLIENT_TOKEN, logger
 from connect4.helper import build_response, empty_response
+from connect4.profiler import profiler
+from connect4.slack_events.tournaments import TournamentCommandStrategy
 from connect4.slack_events.interactions import InteractionContext, GameStartSubmissionInteractionStrategy, \
     BlockActionsInteractionStrategy
 
 loop = asyncio.get_event_loop()
 app = FastAPI()
 
-logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s -%(levelname)s - %(message)s',
-                    datefmt='%d-%b-%y %H:%M:%S')
-
 
 @app.get("/")
 @app.get("/health")
@@ -40,21 +41,22 @@ async def interactions(req_payload: Request):
     :return: The return value is a response object.
     """
     base_url = req_payload.base_url
-    logging.debug(f"Base URL - {base_url}")
+    logger.debug("Base URL - %s", base_url)
     req_data = await req_payload.form()
     req_data = json.loads(req_data['payload'])
     # if req_data['token'] != os.getenv(f"SLACK_VERIFICATION_TOKEN"):
     #     return empty_response(401)
     req_data['token'] = "Hidden from Logs"
-    logging.debug(f"Interaction payload - {req_data}")
+    logger.debug("Interaction payload - %s", req_data, extra={"event": "interaction_payload"})
     # models.InteractionPayload(**req_data)
     slack_client = WebClient(SLACK_WEB_CLIENT_TOKEN)
-    if req_data.get('type') == 'view_submission':
-        view_submission_action = InteractionContext(GameStartSubmissionInteractionStrategy())
-        view_submission_action.execute(req_data, slack_client)
-    elif req_data.get('type') == 'block_actions':
-        block_actions_interaction = InteractionContext(BlockActionsInteractionStrategy())
-        block_actions_interaction.execute(req_data, slack_client)
+    with profiler.request():
+        if req_data.get('type') == 'view_submission':
+            view_submission_action = InteractionContext(GameStartSubmissionInteractionStrategy())
+            view_submission_action.execute(req_data, slack_client)
+        elif req_data.get('type') == 'block_actions':
+            block_actions_interaction = InteractionContext(BlockActionsInteractionStrategy())
+            block_actions_interaction.execute(req_data, slack_client)
     return empty_response(200)
 
 
@@ -75,14 +77,101 @@ async def commands(req_payload: Request):
     #     return empty_response(401)
     # Hide verification token from logs
     req_data['token'] = "Hidden from Logs"
-    logging.debug(f"Command payload - {req_data}")
+    logger.debug("Command payload - %s", req_data, extra={"event": "command_payload"})
     # Pydantic Model Validation
     # models.CommandPayload(**req_data)
     slack_client = WebClient(SLACK_WEB_CLIENT_TOKEN)
-    if req_data['text'] == "help":
-        return CommandContext(HelpCommandStrategy()).execute(req_data, slack_client)
-    elif req_data['text'] == "feedback":
-        return CommandContext(FeedbackModalCommandStrategy()).execute(req_data, slack_client)
-    else:
-        return CommandContext(GameStartModalCommandStrategy()).execute(req_data, slack_client)
-    return empty_response(200)
\ No newline at end of file
+    with profiler.request():
+        if req_data['text'] == "help":
+            return CommandContext(HelpCommandStrategy()).execute(req_data, slack_client)
+        elif req_data['text'] == "feedback":
+            return CommandContext(FeedbackModalCommandStrategy()).execute(req_data, slack_client)
+        elif req_data['text'].split()[:1] == ["tournament"]:
+            return CommandContext(TournamentCommandStrategy()).execute(req_data, slack_client)
+        else:
+            return CommandContext(GameStartModalCommandStrategy()).execute(req_data, slack_client)
+    return empty_response(200)
+
+
+def check_admin_token(admin_token: Optional[str]) -> Optional[Response]:
+    """
+    It guards the debug endpoints. They do not exist unless a profiler admin token is configured, and
+    require the caller to send that token in the `X-Admin-Token` header
+    
+    :param admin_token: The value of the X-Admin-Token header
+    :type admin_token: Optional[str]
+    :return: An error response if the caller is not allowed, None otherwise.
+    """
+    if not PROFILER_ADMIN_TOKEN:
+        return empty_response(404)
+    if not admin_token or not hmac.compare_digest(admin_token.encode(), PROFILER_ADMIN_TOKEN.encode()):
+        return empty_response(403)
+    return None
+
+
+@app.post("/debug/profile")
+def start_profile(seconds: float = 30, sample_rate: float = 1.0, x_admin_token: Optional[str] = Header(None)):
+    """
+    It turns the sampling profiler on for a number of seconds, for every request or for a sampled fraction of
+    them. Samples keep aggregating across runs until they are cleared.
+    
+    :param seconds: How long the profiler stays on, capped at 10 minutes
+    :type seconds: float
+    :param sample_rate: The fraction of requests to profile, all of them by default
+    :type sample_rate: float
+    :param x_admin_token: The profiler admin token
+    :type x_admin_token: Optional[str]
+    :return: A JSON response with the profiler settings.
+    """
+    if error := check_admin_token(x_admin_token):
+        return error
+    if not math.isfinite(seconds) or not math.isfinite(sample_rate):
+        return build_response({"error": "seconds and sample_rate must be finite numbers"}, 400)
+    seconds = min(max(seconds, 0.0), 600.0)
+    sample_rate = min(max(sample_rate, 0.0), 1.0)
+    profiler.start(seconds, sample_rate)
+    return build_response({"status": "profiling", "seconds": seconds, "sample_rate": sample_rate}, 200)
+
+
+@app.get("/debug/profile")
+def get_profile(x_admin_token: Optional[str] = Header(None)):
+    """
+    It returns the aggregated samples as collapsed stacks, ready for flamegraph.pl or speedscope
+    
+    :param x_admin_token: The profiler admin token
+    :type x_admin_token: Optional[str]
+    :return: A plain text response.
+    """
+    if error := check_admin_token(x_admin_token):
+        return error
+    return Response(content=profiler.collapsed(), status_code=200, media_type="text/plain")
+
+
+@app.get("/debug/profile/timers")
+def get_profile_timers(x_admin_token: Optional[str] = Header(None)):
+    """
+    It returns the call counts and durations recorded by the `timed` functions
+    
+    :param x_admin_token: The profiler admin token
+    :type x_admin_token: Optional[str]
+    :return: A JSON response keyed by function name.
+    """
+    if error := check_admin_token(x_admin_token):
+        return error
+    return build_response(profiler.timers(), 200)
+
+
+@app.delete("/debug/profile")
+def clear_profile(x_admin_token: Optional[str] = Header(None)):
+    """
+    It turns the profiler off and clears the aggregated samples and timers
+    
+    :param x_admin_token: The profiler admin token
+    :type x_admin_token: Optional[str]
+    :return: An empty response.
+    """
+    if error := check_admin_token(x_admin_token):
+        return error
+    profiler.stop()
+    profiler.reset()
+    return empty_response(204)
\ No newline at end of file
@@ -18,10 +18,26 @@ def feedback_message(user_feedback, name, workspace, avatar):
 def help_message():
     return "Available commands for Connect4:\n" \
            "`/connect4 @opponent_name` - Play Connect4 with an opponent\n" \
+           "`/connect4 tournament [knockout] @player1 @player2 @player3 ...` - Run a round robin or knockout " \
+           "tournament\n" \
            "`/connect4 help` - Display commands\n" \
            "`/connect4 feedback` - Give feedback about the bot to the developer\n"
 
 
+def tournament_usage_message():
+    return "A tournament needs at least three players:\n" \
+           "`/connect4 tournament @player1 @player2 @player3 ...` - Everybody plays everybody once\n" \
+           "`/connect4 tournament knockout @player1 @player2 @player3 ...` - Winners advance until one is left. " \
+           "Players are seeded in the order they are mentioned: the top seed meets the bottom seed, byes go to the " \
+           "top seeds, the lower seed moves first and a draw sends the higher seed through\n" \
+           "Games that cannot be started count as not played: they give no points and nobody goes through.\n"
+
+
+def tournament_mentions_message():
+    return "I could not read the players you mentioned. Turn on *Escape channels, users, and links sent to " \
+           "your app* in the `/connect4` slash command settings of the Slack app, then try again."
+
+
 def user_message():
     return {
         "text": "Connect4 Assistance",
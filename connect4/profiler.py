@@ -0,0 +1,159 @@
+import functools
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Callable, Optional
+
+from connect4.config import PROFILER_ADMIN_TOKEN
+
+_NO_PROFILING = nullcontext()
+
+
+# SamplingProfiler periodically captures the Python stacks of the threads serving profiled requests and
+# aggregates them into collapsed stacks (`frame;frame;frame count`), the input format of flamegraph.pl and
+# speedscope. Idle background threads (timers, pools, the log writer) are never sampled.
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        """
+        This function takes in the interval between two samples
+
+        :param interval: The number of seconds between two stack samples
+        :type interval: float
+        """
+        self.active = False
+        self._interval = interval
+        self._until = 0.0
+        self._sample_rate = 0.0
+        self._tracked: Counter = Counter()
+        self._stacks: Counter = Counter()
+        self._timers: dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, seconds: float, sample_rate: float = 1.0) -> None:
+        """
+        It starts sampling for the given number of seconds. Only the threads serving the sampled fraction of
+        requests (see `request`) are sampled.
+
+        :param seconds: How long the profiler stays on
+        :type seconds: float
+        :param sample_rate: The fraction of requests to profile, between 0 and 1
+        :type sample_rate: float
+        """
+        with self._lock:
+            self._until = time.monotonic() + seconds
+            self._sample_rate = sample_rate
+            self.active = True
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self.active = False
+        self._sample_rate = 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._timers.clear()
+
+    def request(self):
+        """
+        It returns a context manager that marks the current thread as serving a sampled request, or background
+        work worth profiling. Requests served by the event loop share its thread, so concurrent requests are
+        attributed to the sampled one.
+        :return: A context manager.
+        """
+        if not self.active or random.random() >= self._sample_rate:
+            return _NO_PROFILING
+        return _RequestScope(self._tracked)
+
+    def record(self, name: str, elapsed_ns: int) -> None:
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0, 0])
+            timer[0] += 1
+            timer[1] += elapsed_ns
+            timer[2] = max(timer[2], elapsed_ns)
+
+    def collapsed(self) -> str:
+        """
+        It dumps the aggregated samples as collapsed stacks, most frequent first
+        :return: A string with one `frame;frame;frame count` line per distinct stack.
+        """
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def timers(self) -> dict[str, dict]:
+        """
+        It returns the call count, total and max duration in milliseconds of every `timed` function
+        :return: A dictionary keyed by function name.
+        """
+        with self._lock:
+            return {name: {"calls": count, "total_ms": round(total / 1e6, 3), "max_ms": round(longest / 1e6, 3)}
+                    for name, (count, total, longest) in self._timers.items()}
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self.active or time.monotonic() > self._until:
+                    self.stop()
+                    self._thread = None
+                    return
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or not self._tracked[ident]:
+                    continue
+                stack = []
+                while frame:
+                    stack.append(f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self._stacks[";".join(reversed(stack))] += 1
+            time.sleep(self._interval)
+
+
+class _RequestScope:
+    def __init__(self, tracked: Counter):
+        self._tracked = tracked
+
+    def __enter__(self):
+        self._tracked[threading.get_ident()] += 1
+
+    def __exit__(self, *exc_info):
+        ident = threading.get_ident()
+        self._tracked[ident] -= 1
+        if not self._tracked[ident]:
+            del self._tracked[ident]
+
+
+profiler = SamplingProfiler()
+
+
+def timed(func: Callable) -> Callable:
+    """
+    It wraps a function with a cheap timer whose results are reported by the profiler while it is active.
+    When no profiler admin token is configured the function is returned untouched, so the decorator costs
+    nothing at all.
+
+    :param func: The function to time
+    :type func: Callable
+    :return: The wrapped function.
+    """
+    if not PROFILER_ADMIN_TOKEN:
+        return func
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.active:
+            return func(*args, **kwargs)
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record(name, time.perf_counter_ns() - start)
+
+    return wrapper
@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+
+from connect4.config import logger
+
+
+# TimingWheel is a hashed timing wheel: deadlines are hashed into a fixed ring of slots by tick count, so
+# scheduling and cancelling are O(1) and each tick only touches the entries of a single slot.
+class TimingWheel:
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512, workers: int = 4):
+        """
+        This function takes in the tick length, the number of slots in the ring and the number of worker
+        threads that run expired callbacks.
+
+        :param tick_seconds: The resolution of the wheel in seconds
+        :type tick_seconds: float
+        :param slots: The number of slots in the ring. Deadlines further out than one revolution are
+        tracked with a remaining-rounds counter
+        :type slots: int
+        :param workers: The number of threads that run expired callbacks, so slow callbacks never delay a tick
+        :type workers: int
+        """
+        self._tick_seconds = tick_seconds
+        self._slots: list[dict[Hashable, list]] = [{} for _ in range(slots)]
+        self._index: dict[Hashable, int] = {}
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def schedule(self, key: Hashable, delay_seconds: float, callback: Callable, *args) -> None:
+        """
+        It schedules the callback to run with the given args after the delay, replacing any pending
+        deadline for the same key
+
+        :param key: A unique key for the deadline, e.g. a game id
+        :param delay_seconds: The number of seconds after which the callback runs
+        :param callback: The function to call once the deadline expires
+        """
+        ticks = max(1, math.ceil(delay_seconds / self._tick_seconds))
+        with self._lock:
+            self._remove(key)
+            slot = (self._cursor + ticks) % len(self._slots)
+            self._slots[slot][key] = [(ticks - 1) // len(self._slots), callback, args]
+            self._index[key] = slot
+        self.start()
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        It removes the pending deadline for the key
+        :return: True if a deadline was pending, False otherwise.
+        """
+        with self._lock:
+            return self._remove(key)
+
+    def start(self) -> None:
+        """
+        It starts the background ticker thread, if it is not already running
+        """
+        if self._thread:
+            return
+        with self._lock:
+            if not self._thread:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='timing-wheel')
+                self._thread = threading.Thread(target=self._run, name='timing-wheel-ticker', daemon=True)
+                self._thread.start()
+
+    def advance(self) -> list[tuple[Callable, tuple]]:
+        """
+        It moves the wheel forward by one tick and pops the entries that are due
+        :return: A list of (callback, args) tuples that expired on this tick.
+        """
+        expired: list[tuple[Callable, tuple]] = []
+        with self._lock:
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            slot = self._slots[self._cursor]
+            for key, entry in list(slot.items()):
+                if entry[0]:
+                    entry[0] -= 1
+                    continue
+                del slot[key]
+                del self._index[key]
+                expired.append((entry[1], entry[2]))
+        return expired
+
+    def _remove(self, key: Hashable) -> bool:
+        slot = self._index.pop(key, None)
+        if slot is None:
+            return False
+        del self._slots[slot][key]
+        return True
+
+    def _run(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self._tick_seconds
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            for callback, args in self.advance():
+                self._executor.submit(self._fire, callback, args)
+
+    @staticmethod
+    def _fire(callback: Callable, args: tuple) -> None:
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("Scheduled callback %s failed", getattr(callback, '__name__', callback))
+
+
+# The wheel that holds the next deadline of every ongoing game: the end of the turn, or the idle expiry
+game_timers = TimingWheel()
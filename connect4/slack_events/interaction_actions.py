@@ -1,13 +1,31 @@
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from fastapi import Response
 
+from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
 from slack_sdk.web import WebClient
 
 from connect4.slack_events.commands import CommandContext, GameStartModalCommandStrategy
-from connect4.config import logger
+from connect4.config import IDLE_GAME_TIMEOUT, SLACK_WEB_CLIENT_TOKEN, logger
 from connect4.connect_four import ConnectFour
 from connect4.helper import build_response, empty_response, modify_game_board_message, modify_game_board_win_positions, \
-    get_play_again_button_block
+    get_play_again_button_block, refresh_game_deadlines, get_game_deadline, build_new_game_message, \
+    build_tournament_standings_message, format_duration
+from connect4.profiler import profiler, timed
+from connect4.scheduler import game_timers
+from connect4.tournament import TOURNAMENT_TURN_TIMEOUT, Tournament, tournaments
+
+# Tournament games are posted from a small pool so a round starts all of its games at once
+tournament_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='tournament')
+# A move and the timer of the same game take turns on one of these locks, picked by the game id
+game_locks = [threading.Lock() for _ in range(256)]
+# How long to wait before trying again when the game message could not be fetched for an expired deadline
+EXPIRY_RETRY_SECONDS = 300
 
 
 class ActionStrategy(ABC):
@@ -56,13 +74,31 @@ class PlayAgainActionStrategy(ActionStrategy):
                                         metadata={'event_type': 'game_updated',
                                                   'event_payload': metadata_payload},
                                         blocks=blocks)
-        logger.debug(f"Play again button removed - {resp}")
+        logger.debug("Play again button removed - %s", resp,
+                     extra={"event": "slack_response", "game_id": f"{channel_id}:{req_data.get('message').get('ts')}",
+                            "strategy": type(self).__name__})
         return CommandContext(GameStartModalCommandStrategy()).execute(req_data, slack_client)
 
 
 class PlayCurrentGameActionStrategy(ActionStrategy):
+    @timed
     def process_action(self, req_data: dict, slack_client: WebClient):
-        # logger.debug(f"Message - {req_data.get('message')}")
+        channel_id = req_data.get('channel').get('id')
+        game_id = f"{channel_id}:{req_data.get('message').get('ts')}"
+        with game_lock(game_id):
+            # Stop the clock while the move is played, it is rearmed from the resulting game state
+            game_timers.cancel(game_id)
+            metadata_payload = req_data.get('message').get('metadata').get('event_payload')
+            if 0 < get_game_deadline(metadata_payload) < time.time():
+                # The timer for this game was lost (e.g. on a restart) or has not fired yet, expire the game now
+                ActionContext(get_expiry_strategy(metadata_payload)).execute(req_data, slack_client)
+            else:
+                self.play_move(req_data, slack_client)
+                schedule_game_expiry(channel_id, req_data.get('message'))
+        return empty_response(200)
+
+    def play_move(self, req_data: dict, slack_client: WebClient):
+        start = time.perf_counter()
         user_id = req_data.get('user').get('id')
         metadata_payload = req_data.get('message').get('metadata').get('event_payload')
         if user_id == metadata_payload.get('next_player') and metadata_payload.get('game_status') == 'ongoing':
@@ -95,9 +131,229 @@ class PlayCurrentGameActionStrategy(ActionStrategy):
                         {'text': f":woman-shrugging::skin-tone-2:   "
                                  f"*Nobody won the game*   :woman-shrugging::skin-tone-2: "})
                     blocks.append(get_play_again_button_block())
+                refresh_game_deadlines(metadata_payload)
                 resp = slack_client.chat_update(channel=channel_id, ts=req_data.get('message').get('ts'),
                                                 text=req_data.get('message').get('text'),
                                                 metadata={'event_type': 'game_updated',
                                                           'event_payload': metadata_payload}, blocks=blocks)
-                logger.debug(resp)
+                if metadata_payload.get('game_status') == 'completed':
+                    report_tournament_result(metadata_payload, user_id if win_positions else None, slack_client)
+                game_id = f"{channel_id}:{req_data.get('message').get('ts')}"
+                logger.debug("Game board updated - %s", resp,
+                             extra={"event": "slack_response", "game_id": game_id, "strategy": type(self).__name__})
+                logger.info("Move played in column %s", game_column,
+                            extra={"event": "move_played", "game_id": game_id, "strategy": type(self).__name__,
+                                   "duration_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
+class TurnTimeoutActionStrategy(ActionStrategy):
+    def process_action(self, req_data: dict, slack_client: WebClient):
+        channel_id = req_data.get('channel').get('id')
+        message: dict = req_data.get('message')
+        game_id = f"{channel_id}:{message.get('ts')}"
+        metadata_payload = message.get('metadata').get('event_payload')
+        if metadata_payload.get('game_status') != 'ongoing':
+            return empty_response(200)
+        loser_id = metadata_payload.get('next_player')
+        winner_id = next(key for key, val in list(metadata_payload.items())[:2] if val == metadata_payload.get(loser_id) * -1)
+        metadata_payload.update({'game_status': 'completed', 'forfeited_by': loser_id})
+        blocks: list = message.get('blocks')
+        block_indexer = dict((block['block_id'], i) for i, block in enumerate(blocks))
+        blocks[block_indexer.get('game_status')].get('text').update(
+            {'text': f":hourglass: *<@{loser_id}>* ran out of time - *<@{winner_id}>* won the game by forfeit"})
+        blocks.append(get_play_again_button_block())
+        resp = slack_client.chat_update(channel=channel_id, ts=message.get('ts'), text=message.get('text'),
+                                        metadata={'event_type': 'game_updated', 'event_payload': metadata_payload},
+                                        blocks=blocks)
+        logger.debug("Game forfeited - %s", resp,
+                     extra={"event": "slack_response", "game_id": game_id, "strategy": type(self).__name__})
+        logger.info("Turn timed out for %s", loser_id,
+                    extra={"event": "game_forfeited", "game_id": game_id, "strategy": type(self).__name__})
+        report_tournament_result(metadata_payload, winner_id, slack_client)
         return empty_response(200)
+
+
+class AbandonedGameActionStrategy(ActionStrategy):
+    def process_action(self, req_data: dict, slack_client: WebClient):
+        channel_id = req_data.get('channel').get('id')
+        message: dict = req_data.get('message')
+        game_id = f"{channel_id}:{message.get('ts')}"
+        metadata_payload = message.get('metadata').get('event_payload')
+        if metadata_payload.get('game_status') != 'ongoing':
+            return empty_response(200)
+        metadata_payload.update({'game_status': 'abandoned'})
+        blocks: list = message.get('blocks')
+        block_indexer = dict((block['block_id'], i) for i, block in enumerate(blocks))
+        blocks[block_indexer.get('game_status')].get('text').update(
+            {'text': f":zzz: This game was closed after {format_duration(IDLE_GAME_TIMEOUT)} without a move"})
+        blocks.append(get_play_again_button_block())
+        resp = slack_client.chat_update(channel=channel_id, ts=message.get('ts'), text=message.get('text'),
+                                        metadata={'event_type': 'game_updated', 'event_payload': metadata_payload},
+                                        blocks=blocks)
+        logger.debug("Game closed - %s", resp,
+                     extra={"event": "slack_response", "game_id": game_id, "strategy": type(self).__name__})
+        logger.info("Game abandoned", extra={"event": "game_abandoned", "game_id": game_id,
+                                             "strategy": type(self).__name__})
+        return empty_response(200)
+
+
+def game_lock(game_id: str) -> threading.Lock:
+    return game_locks[hash(game_id) % len(game_locks)]
+
+
+def get_expiry_strategy(metadata_payload: dict) -> ActionStrategy:
+    """
+    It picks what happens to a game once its deadline has passed: a timed game is forfeited by the player to
+    move, an untimed game is closed as abandoned
+    """
+    return TurnTimeoutActionStrategy() if metadata_payload.get('turn_deadline') else AbandonedGameActionStrategy()
+
+
+def expire_game(channel_id: str, ts: str, deadline: int):
+    """
+    It is called by the game timer once a deadline has passed. It fetches the current game message and expires
+    the game, unless a move has restarted the clock in the meantime. Reading the group DM needs the
+    `mpim:history` scope; if the message cannot be fetched the timer is rearmed so the deadline is not lost.
+    
+    :param channel_id: The channel the game is being played in
+    :type channel_id: str
+    :param ts: The ts of the game message
+    :type ts: str
+    :param deadline: The deadline the timer was armed with
+    :type deadline: int
+    """
+    slack_client = WebClient(SLACK_WEB_CLIENT_TOKEN)
+    game_id = f"{channel_id}:{ts}"
+    with profiler.request(), game_lock(game_id):
+        try:
+            resp = slack_client.conversations_history(channel=channel_id, latest=ts, inclusive=True, limit=1,
+                                                      include_all_metadata=True)
+        except SlackApiError as e:
+            logger.error("Could not fetch game %s to expire it, retrying in %s seconds: %s", game_id,
+                         EXPIRY_RETRY_SECONDS, e, extra={"event": "game_expiry_failed", "game_id": game_id})
+            game_timers.schedule(game_id, EXPIRY_RETRY_SECONDS, expire_game, channel_id, ts, deadline)
+            return
+        messages = resp.get('messages') or []
+        if not messages or messages[0].get('ts') != ts:
+            return
+        metadata_payload = (messages[0].get('metadata') or {}).get('event_payload') or {}
+        if get_game_deadline(metadata_payload) != deadline:
+            return
+        ActionContext(get_expiry_strategy(metadata_payload)).execute(
+            {'channel': {'id': channel_id}, 'message': messages[0]}, slack_client)
+
+
+def schedule_game_expiry(channel_id: str, message: dict):
+    """
+    It (re)arms the timer of a game from its latest message, or cancels it once the game is over. The timer
+    only keeps the channel, ts and deadline of the game; the message itself is fetched again when it fires.
+    
+    :param channel_id: The channel the game is being played in
+    :type channel_id: str
+    :param message: The latest game message, with ts and metadata
+    :type message: dict
+    """
+    game_id = f"{channel_id}:{message.get('ts')}"
+    if not (deadline := get_game_deadline(message.get('metadata').get('event_payload'))):
+        game_timers.cancel(game_id)
+        return
+    game_timers.schedule(game_id, deadline - time.time(), expire_game, channel_id, message.get('ts'), deadline)
+
+
+def start_game(slack_client: WebClient, player1_id: str, player2_id: str, turn_timeout: int = 0,
+               tournament_match: Optional[dict] = None) -> str:
+    """
+    It opens a group DM between the two players, posts a new game board in it and arms the game timer
+    
+    :param slack_client: The slack client object
+    :type slack_client: WebClient
+    :param player1_id: The user id of the player who moves first
+    :type player1_id: str
+    :param player2_id: The user id of the opponent
+    :type player2_id: str
+    :param turn_timeout: the number of seconds a player has to make a move, 0 for no limit
+    :type turn_timeout: int
+    :param tournament_match: The tournament id and match id of a tournament game
+    :type tournament_match: Optional[dict]
+    :return: The game id, made of the channel id and the message ts.
+    """
+    metadata, blocks = build_new_game_message(player1_id, player2_id, (6, 7), turn_timeout)
+    if tournament_match:
+        metadata.get('event_payload').update(tournament_match)
+    resp = slack_client.conversations_open(users=[player1_id, player2_id])
+    mpdm_channel_id = resp.get('channel').get('id')
+    resp = slack_client.chat_postMessage(channel=mpdm_channel_id, text=f"<@{player1_id}> vs <@{player2_id}>",
+                                         blocks=blocks, metadata=metadata, link_names=True)
+    schedule_game_expiry(mpdm_channel_id, {'ts': resp.get('ts'), 'metadata': metadata})
+    game_id = f"{mpdm_channel_id}:{resp.get('ts')}"
+    logger.debug("Game message posted - %s", resp, extra={"event": "slack_response", "game_id": game_id})
+    return game_id
+
+
+def launch_tournament_round(tournament: Tournament, matches: list[tuple[str, str, str]], slack_client: WebClient):
+    """
+    It starts every game of a tournament round concurrently and returns without waiting for them. Games are
+    posted with a client that waits out Slack's rate limits instead of failing.
+    
+    :param tournament: The tournament the round belongs to
+    :type tournament: Tournament
+    :param matches: A list of (match id, player 1, player 2) tuples
+    :type matches: list[tuple[str, str, str]]
+    :param slack_client: The slack client object
+    :type slack_client: WebClient
+    """
+    launch_client = WebClient(token=slack_client.token,
+                              retry_handlers=slack_client.retry_handlers + [RateLimitErrorRetryHandler(max_retry_count=5)])
+    for match_id, player1_id, player2_id in matches:
+        tournament_executor.submit(launch_tournament_game, tournament, match_id, player1_id, player2_id, launch_client)
+
+
+def launch_tournament_game(tournament: Tournament, match_id: str, player1_id: str, player2_id: str,
+                           slack_client: WebClient):
+    """
+    It starts a single tournament game. It runs on the tournament executor where nobody reads the result,
+    so any failure is logged here and the game is recorded as not played so the round can still finish.
+    """
+    tournament_match = {'tournament_id': tournament.tournament_id, 'match_id': match_id}
+    try:
+        with profiler.request():
+            start_game(slack_client, player1_id, player2_id, TOURNAMENT_TURN_TIMEOUT, tournament_match)
+        return
+    except Exception:
+        logger.exception("Could not start tournament game %s of tournament %s", match_id, tournament.tournament_id)
+    try:
+        report_tournament_result(tournament_match, None, slack_client, played=False)
+    except Exception:
+        logger.exception("Could not record tournament game %s of tournament %s", match_id, tournament.tournament_id)
+
+
+def report_tournament_result(metadata_payload: dict, winner_id: Optional[str], slack_client: WebClient,
+                             played: bool = True):
+    """
+    It records the result of a completed game in its tournament, if any, starts the next round once the
+    current one is over and refreshes the standings message
+    
+    :param metadata_payload: the event payload of the game message metadata
+    :type metadata_payload: dict
+    :param winner_id: The user id of the winner, None for a draw
+    :type winner_id: Optional[str]
+    :param slack_client: The slack client object
+    :type slack_client: WebClient
+    :param played: False if the game could not be started
+    :type played: bool
+    """
+    tournament = tournaments.get(metadata_payload.get('tournament_id'))
+    if not tournament:
+        return
+    if tournament.record_result(metadata_payload.get('match_id'), winner_id, played):
+        if matches := tournament.next_round():
+            launch_tournament_round(tournament, matches, slack_client)
+        else:
+            tournaments.pop(tournament.tournament_id, None)
+    with tournament.standings_lock:
+        with tournament.lock:
+            text, blocks = build_tournament_standings_message(tournament)
+        try:
+            slack_client.chat_update(channel=tournament.channel_id, ts=tournament.standings_ts, text=text, blocks=blocks)
+        except SlackApiError as e:
+            logger.error("Could not update the standings of tournament %s: %s", tournament.tournament_id, e)
@@ -1,12 +1,14 @@
+import time
 from abc import ABC, abstractmethod
 
 from slack_sdk.web import WebClient
 
 from connect4.slack_events.interaction_actions import ActionContext, UsersSelectActionStrategy, PlayAgainActionStrategy, \
-    PlayCurrentGameActionStrategy
+    PlayCurrentGameActionStrategy, start_game
 from connect4.config import logger
-from connect4.helper import build_response, empty_response, build_new_game_message
+from connect4.helper import build_response, empty_response
 from connect4.messages import feedback_message, user_message
+from connect4.profiler import timed
 
 
 # This class is an abstract base class that defines the interface for interaction strategies.
@@ -35,10 +37,14 @@ class InteractionContext:
 
 # It's a strategy for interacting with the game start submission page
 class GameStartSubmissionInteractionStrategy(InteractionStrategy):
+    @timed
     def process_interaction(self, req_data: dict, slack_client: WebClient):
+        start = time.perf_counter()
         user_id = req_data.get('user').get('id')
-        player_id = req_data.get('view').get('state').get('values').get('player_id').get('users-select-action').get(
-            'selected_user')
+        state_values = req_data.get('view').get('state').get('values')
+        player_id = state_values.get('player_id').get('users-select-action').get('selected_user')
+        turn_timeout_option = state_values.get('turn_timeout', {}).get('turn-timeout-action', {}).get('selected_option')
+        turn_timeout = int(turn_timeout_option.get('value')) if turn_timeout_option else 0
         # TODO check if you have to remove this
         if user_id == player_id:
             return build_response({
@@ -47,12 +53,9 @@ class GameStartSubmissionInteractionStrategy(InteractionStrategy):
                     "users_select": "You cannot play the game with yourself"
                 }
             }, 200)
-        metadata, blocks = build_new_game_message(user_id, player_id, (6, 7))
-        resp = slack_client.conversations_open(users=[user_id, player_id])
-        mpdm_channel_id = resp.get('channel').get('id')
-        resp = slack_client.chat_postMessage(channel=mpdm_channel_id, text=f"<@{user_id}> vs <@{player_id}>",
-                                             blocks=blocks, metadata=metadata, link_names=True)
-        logger.debug(resp)
+        game_id = start_game(slack_client, user_id, player_id, turn_timeout)
+        logger.info("Game started", extra={"event": "game_started", "game_id": game_id, "strategy": type(self).__name__,
+                                           "duration_ms": round((time.perf_counter() - start) * 1000, 2)})
         return empty_response(200)
 
 
@@ -68,10 +71,10 @@ class FeedbackSubmissionInteractionStrategy(InteractionStrategy):
         feedback = feedback_message(user_feedback, name, workspace, avatar)
         # TODO - feedback channel
         resp = slack_client.chat_postMessage(channel="", text=feedback['text'], attachments=feedback["attachments"])
-        logger.debug(f"Updated Feedback Metrics channel with status code {resp.status_code}")
+        logger.debug("Updated Feedback Metrics channel with status code %s", resp.status_code)
         resp = slack_client.chat_postMessage(channel=user_id, text=user_message()['text'],
                                              attachments=user_message()["attachments"])
-        logger.debug(f"Updated User's channel with status code {resp.status_code}")
+        logger.debug("Updated User's channel with status code %s", resp.status_code)
 
 
 # It's a strategy for interacting with a block
@@ -0,0 +1,43 @@
+import re
+
+from fastapi import Response
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import WebClient
+
+from connect4.slack_events.commands import CommandStrategy
+from connect4.slack_events.interaction_actions import launch_tournament_round
+from connect4.config import logger
+from connect4.helper import empty_response, build_tournament_standings_message
+from connect4.messages import tournament_mentions_message, tournament_usage_message
+from connect4.tournament import KNOCKOUT, ROUND_ROBIN, Tournament, tournaments
+
+# Slack escapes user mentions in slash commands as <@U0123ABCD|name>, when the command is set to escape them
+USER_MENTION = re.compile(r"<@([UW][A-Z0-9]+)(?:\|[^>]*)?>")
+# A plain @name, sent when the command does not escape mentions
+UNESCAPED_MENTION = re.compile(r"(?:^|\s)@\S+")
+
+
+# This class is a command strategy that starts a tournament between the mentioned players
+class TournamentCommandStrategy(CommandStrategy):
+    def process_command(self, req_data: dict, slack_client: WebClient):
+        words = req_data.get('text').split()
+        bracket_format = KNOCKOUT if len(words) > 1 and words[1] == KNOCKOUT else ROUND_ROBIN
+        players = list(dict.fromkeys(USER_MENTION.findall(req_data.get('text'))))
+        if not players and UNESCAPED_MENTION.search(req_data.get('text')):
+            return Response(tournament_mentions_message(), 200)
+        if len(players) < 3:
+            return Response(tournament_usage_message(), 200)
+        tournament = Tournament(players, bracket_format, req_data.get('channel_id'))
+        matches = tournament.next_round()
+        text, blocks = build_tournament_standings_message(tournament)
+        try:
+            resp = slack_client.chat_postMessage(channel=tournament.channel_id, text=text, blocks=blocks)
+        except SlackApiError as e:
+            logger.error("Could not post the standings of tournament %s: %s", tournament.tournament_id, e)
+            return Response("I could not post in this channel, please add me to it and try again.", 200)
+        tournament.standings_ts = resp.get('ts')
+        tournaments[tournament.tournament_id] = tournament
+        launch_tournament_round(tournament, matches, slack_client)
+        logger.info("Tournament started with %s players", len(players),
+                    extra={"event": "tournament_started", "strategy": type(self).__name__})
+        return empty_response(200)
@@ -0,0 +1,153 @@
+import threading
+import uuid
+from typing import Optional
+
+ROUND_ROBIN = "round_robin"
+KNOCKOUT = "knockout"
+# Tournament games always run on a clock so an abandoned game cannot stall the bracket
+TOURNAMENT_TURN_TIMEOUT = 3600
+
+
+# Tournament holds the bracket of a tournament. Results are recorded in O(1) per game: pending matches are
+# kept in a dictionary keyed by match id and a round is over once its counter of unfinished games hits zero.
+class Tournament:
+    def __init__(self, players: list[str], bracket_format: str, channel_id: str):
+        """
+        This function takes in the players, the bracket format and the channel the standings are posted in
+
+        :param players: The user ids of the players, in seeding order
+        :type players: list[str]
+        :param bracket_format: Either `round_robin` or `knockout`
+        :type bracket_format: str
+        :param channel_id: The channel the standings message is posted in
+        :type channel_id: str
+        """
+        self.tournament_id: str = uuid.uuid4().hex[:8]
+        self.players = players
+        self.bracket_format = bracket_format
+        self.channel_id = channel_id
+        self.standings_ts: Optional[str] = None
+        self.round = 0
+        self.champion: Optional[str] = None
+        self.ended = False
+        self.stats: dict[str, dict[str, int]] = {player: {"won": 0, "drawn": 0, "lost": 0, "unplayed": 0}
+                                                 for player in players}
+        self.unplayed_matches: list[tuple[str, str]] = []
+        self._pending: dict[str, tuple[str, str]] = {}
+        self._unfinished = 0
+        self._seeds: dict[str, int] = {player: seed for seed, player in enumerate(players)}
+        self._alive: list[str] = list(players)
+        self._advancing: list[str] = []
+        self._rotation: list[Optional[str]] = list(players) + [None] * (len(players) % 2)
+        self._first_moves: dict[str, int] = dict.fromkeys(players, 0)
+        self.lock = threading.Lock()
+        # Held while the standings are rendered and posted, so updates reach Slack in the order they were rendered
+        self.standings_lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.ended
+
+    @property
+    def total_rounds(self) -> int:
+        if self.bracket_format == ROUND_ROBIN:
+            return len(self._rotation) - 1
+        return (len(self.players) - 1).bit_length()
+
+    def next_round(self) -> list[tuple[str, str, str]]:
+        """
+        It pairs the players for the next round, or crowns the champion once there is nothing left to play
+        :return: A list of (match id, player 1, player 2) tuples, empty once the tournament is finished.
+        """
+        with self.lock:
+            pairings = self._round_robin_pairings() if self.bracket_format == ROUND_ROBIN else self._knockout_pairings()
+            if not pairings:
+                self.champion = self._leader()
+                self.ended = True
+                return []
+            self.round += 1
+            matches = [(f"{self.round}-{i}", player1, player2) for i, (player1, player2) in enumerate(pairings)]
+            self._pending = {match_id: (player1, player2) for match_id, player1, player2 in matches}
+            self._unfinished = len(matches)
+            return matches
+
+    def record_result(self, match_id: str, winner_id: Optional[str], played: bool = True) -> bool:
+        """
+        It records the result of a match. In a knockout bracket a drawn game sends the higher seed through, the
+        lower seed having had the first move. A match that was not played gives no points and, in a knockout
+        bracket, sends nobody through.
+
+        :param match_id: The id of the finished match
+        :type match_id: str
+        :param winner_id: The user id of the winner, None for a draw
+        :type winner_id: Optional[str]
+        :param played: False if the game could not be started
+        :type played: bool
+        :return: True if this result finished the current round.
+        """
+        with self.lock:
+            players = self._pending.pop(match_id, None)
+            if not players:
+                return False
+            if not played:
+                self.unplayed_matches.append(players)
+            for player in players:
+                outcome = "unplayed" if not played else "drawn" if winner_id is None else \
+                    "won" if player == winner_id else "lost"
+                self.stats[player][outcome] += 1
+            if self.bracket_format == KNOCKOUT and played:
+                self._advancing.append(winner_id or min(players, key=self._seeds.get))
+            self._unfinished -= 1
+            return self._unfinished == 0
+
+    def points(self, player: str) -> int:
+        return 3 * self.stats[player]["won"] + self.stats[player]["drawn"]
+
+    def standings(self) -> list[str]:
+        """
+        It orders the players by points, then wins, then seed
+        :return: A list of user ids.
+        """
+        return sorted(self.players, key=lambda player: (-self.points(player), -self.stats[player]["won"]))
+
+    def _round_robin_pairings(self) -> list[tuple[str, str]]:
+        # Circle method: the first player stays put while everybody else rotates by one seat per round
+        if self.round >= len(self._rotation) - 1:
+            return []
+        seats = self._rotation
+        pairings = []
+        for i in range(len(seats) // 2):
+            player1, player2 = seats[i], seats[-1 - i]
+            if not player1 or not player2:
+                continue
+            # The player who has moved first less often so far moves first, so the first move stays balanced
+            if (self._first_moves[player2], (self.round + i) % 2) < (self._first_moves[player1], 1):
+                player1, player2 = player2, player1
+            self._first_moves[player1] += 1
+            pairings.append((player1, player2))
+        self._rotation = [seats[0], seats[-1]] + seats[1:-1]
+        return pairings
+
+    def _knockout_pairings(self) -> list[tuple[str, str]]:
+        if self.round:
+            self._alive = sorted(self._advancing, key=self._seeds.get)
+        self._advancing = []
+        if len(self._alive) < 2:
+            return []
+        contenders = self._alive
+        if len(contenders) % 2:
+            # The top seed left gets a bye into the next round
+            self._advancing.append(contenders[0])
+            contenders = contenders[1:]
+        # Top seed meets bottom seed, and the lower seed of each pair moves first
+        return [(contenders[-1 - i], contenders[i]) for i in range(len(contenders) // 2)]
+
+    def _leader(self) -> Optional[str]:
+        if self.bracket_format == KNOCKOUT:
+            return self._alive[0] if len(self._alive) == 1 else None
+        played = any(stats["won"] + stats["drawn"] + stats["lost"] for stats in self.stats.values())
+        return self.standings()[0] if played else None
+
+
+# Tournaments in progress, keyed by tournament id. A tournament is dropped as soon as it has ended.
+tournaments: dict[str, Tournament] = {}